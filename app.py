@@ -2,13 +2,22 @@
 Ultimate AI Study Planner Bot — autonomous mentor UI.
 Chat + sidebar stats, today's tasks, points, levels, streaks.
 """
-import re
+import uuid
+from datetime import date
+
 import streamlit as st
 from planner import (
+    UNCLEAR_REPLY,
     StudyPlan,
+    Task,
     explain_topic,
     get_greeting,
+    match_intent,
+    parse_add_batch,
     parse_add_command,
+    parse_exam_command,
+    parse_simple_cmd,
+    parse_task_command,
 )
 
 st.set_page_config(
@@ -18,7 +27,11 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-st.markdown("""
+
+@st.cache_resource
+def _css_blob() -> str:
+    """Page CSS, built once per process. Emitted on every run: Streamlit drops elements a rerun skips."""
+    return """
 <style>
     .block-container { max-width: 900px; padding-top: 1rem; }
     [data-testid="stSidebar"] { background: linear-gradient(180deg, #1e293b 0%, #0f172a 100%); }
@@ -29,19 +42,30 @@ st.markdown("""
     h1 { font-size: 1.6rem; }
     .subtitle { color: #64748b; font-size: 0.9rem; margin-bottom: 1rem; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+st.markdown(_css_blob(), unsafe_allow_html=True)
 
 if "plan" not in st.session_state:
     st.session_state.plan = StudyPlan()
+    st.session_state.plan_key = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = [{"role": "assistant", "content": get_greeting()}]
 
 plan = st.session_state.plan
 
 
-def bot_response(user_input: str) -> str:
-    text = user_input.strip().lower()
-    raw = user_input.strip()
+def _handle_add(raw: str, text: str) -> str | None:
+    # Several add lines pasted at once
+    if "\n" in raw:
+        batch = parse_add_batch(raw.splitlines())
+        if batch:
+            with plan.batch():
+                return "\n".join(
+                    plan.add_subject(name=cmd["name"], hours=cmd["hours"], subject_type=cmd["subject_type"])
+                    for cmd in batch
+                )
 
     # Add subject (with optional subject_type: coding/college from parse_add_command)
     add_parsed = parse_add_command(raw)
@@ -51,113 +75,199 @@ def bot_response(user_input: str) -> str:
             hours=add_parsed["hours"],
             subject_type=add_parsed.get("subject_type", "general"),
         )
+    return None
+
 
+def _handle_task(raw: str, text: str) -> str | None:
     # Task <subject> <title> [due YYYY-MM-DD]
-    task_match = re.match(r"task\s+(.+?)(?:\s+due\s+(\d{4}-\d{2}-\d{2}))?$", raw, re.I | re.DOTALL)
-    if task_match:
-        rest = task_match.group(1).strip()
-        due = task_match.group(2)
-        parts = rest.split(maxsplit=1)
-        if len(parts) >= 2:
-            return plan.add_task(parts[0], parts[1], due)
-        return "Use: *task &lt;subject&gt; &lt;title&gt;* or *task &lt;subject&gt; &lt;title&gt; due YYYY-MM-DD*."
+    cmd = parse_task_command(raw)
+    if cmd is None:
+        return None
+    if cmd["title"]:
+        return plan.add_task(cmd["subject_name"], cmd["title"], cmd["due_date"])
+    return "Use: *task &lt;subject&gt; &lt;title&gt;* or *task &lt;subject&gt; &lt;title&gt; due YYYY-MM-DD*."
+
 
+def _handle_done(raw: str, text: str) -> str | None:
     # Done <task_id>
-    done_match = re.match(r"done\s+(\w+)", text)
-    if done_match:
-        return plan.complete_task(done_match.group(1).strip())
+    task_id = parse_simple_cmd("done", text)
+    return plan.complete_task(task_id) if task_id else None
 
+
+def _handle_skip(raw: str, text: str) -> str | None:
     # Skip <task_id>
-    skip_match = re.match(r"skip\s+(\w+)", text)
-    if skip_match:
-        return plan.skip_task(skip_match.group(1).strip())
+    task_id = parse_simple_cmd("skip", text)
+    return plan.skip_task(task_id) if task_id else None
 
-    # Revision plan <exam_id>
-    rev_match = re.match(r"revision\s+(?:plan\s+)?(\w+)", text)
-    if rev_match:
-        return plan.get_revision_plan(rev_match.group(1).strip())
 
+def _handle_exam(raw: str, text: str) -> str | None:
     # Exam <name> <subject> <date> [chapters 1-5]
-    exam_match = re.match(r"exam\s+(.+?)\s+(\S+)\s+(\d{4}-\d{2}-\d{2})(?:\s+chapters\s+(.+))?$", raw, re.I)
-    if exam_match:
-        name = exam_match.group(1).strip()
-        subj = exam_match.group(2).strip()
-        d = exam_match.group(3).strip()
-        chapters = (exam_match.group(4) or "").strip()
-        return plan.add_exam(name, subj, d, chapters=chapters)
+    cmd = parse_exam_command(raw)
+    if cmd is None:
+        return None
+    return plan.add_exam(cmd["name"], cmd["subject_name"], cmd["exam_date"], chapters=cmd["chapters"])
+
+
+# Mutating commands, keyed by their leading verb. Each handler returns None when the message doesn't parse.
+COMMAND_HANDLERS = {
+    "add": _handle_add,
+    "task": _handle_task,
+    "done": _handle_done,
+    "skip": _handle_skip,
+    "exam": _handle_exam,
+}
+
+
+def bot_response(user_input: str) -> str:
+    raw = user_input.strip()
+    text = raw if raw.islower() else raw.lower()
+
+    first = text.split(maxsplit=1)[0] if text else ""
+    handler = COMMAND_HANDLERS.get(first)
+    if handler:
+        out = handler(raw, text)
+        if out is not None:
+            return out
+
+    # "add" later in the message, e.g. "please add Math 5"
+    if handler is not _handle_add:
+        out = _handle_add(raw, text)
+        if out is not None:
+            return out
+
+    # Clear / reset (only when no read-only intent takes precedence)
+    if match_intent(text) == "clear" and not (
+        parse_simple_cmd("revision", text) or parse_simple_cmd("explain", text)
+    ):
+        return plan.clear()
+
+    return _read_only_response(text, plan_signature())
+
+
+def plan_signature() -> tuple:
+    """Cache key for the current plan state: session, save revision, and day (days left / today)."""
+    return (st.session_state.plan_key, plan.rev, date.today().isoformat())
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _read_only_response(text: str, plan_sig: tuple) -> str:
+    """Answer non-mutating commands. Cached per (text, plan_sig); plan_sig changes on every save."""
+    # Revision plan <exam_id>
+    exam_id = parse_simple_cmd("revision", text)
+    if exam_id:
+        return plan.get_revision_plan(exam_id)
+
+    intent = match_intent(text)
 
     # List / show
-    if any(x in text for x in ("list subjects", "show subjects", "subjects", "what are my subjects")):
+    if intent == "list_subj":
         return plan.list_subjects()
-    if any(x in text for x in ("list tasks", "show tasks", "my tasks", "tasks")) and "task" in text:
+    if intent == "list_tasks":
         return plan.list_tasks(pending_only=True)
-    if any(x in text for x in ("list exams", "exams", "show exams")):
+    if intent == "exams":
         return plan.list_exams()
-    if "stats" in text or "level" in text or "points" in text or "streak" in text:
+    if intent == "stats":
         return plan.get_stats_text()
 
     # Weekly plan
-    if any(x in text for x in ("weekly", "week plan", "this week")):
+    if intent == "weekly":
         hours = plan.get_adaptive_study_hours()
         return plan.suggest_weekly_schedule(study_hours_per_day=hours)
 
     # Explain <topic>
-    explain_match = re.match(r"explain\s+(.+)", text)
-    if explain_match:
-        return explain_topic(explain_match.group(1).strip())
+    topic = parse_simple_cmd("explain", text)
+    if topic:
+        return explain_topic(topic)
 
     # Schedule / daily plan (with strict note if plan reduced)
-    if any(x in text for x in ("schedule", "daily", "plan for today", "today", "plan")):
+    if intent == "daily":
         hours = plan.get_adaptive_study_hours()
         out = plan.suggest_daily_schedule(study_hours_per_day=hours)
         return out + plan.get_schedule_strict_note()
 
-    # Clear / reset
-    if "clear" in text or "reset" in text:
-        return plan.clear()
-
     # Greeting / help
-    if any(x in text for x in ("hi", "hello", "hey", "help")):
+    if intent == "hello":
         return get_greeting()
 
-    return (
-        "Unclear. Use: *add*, *schedule*, *weekly*, *task*, *tasks*, *done/skip &lt;id&gt;*, "
-        "*exam*, *exams*, *revision plan &lt;id&gt;*, *explain &lt;topic&gt;*, *stats*, *clear*."
-    )
+    return UNCLEAR_REPLY
 
 
-# ----- Sidebar: stats + today's tasks -----
-with st.sidebar:
+@st.cache_data(show_spinner=False, max_entries=64)
+def _sidebar_snapshot(plan_sig: tuple) -> tuple[str, tuple[Task, ...]]:
+    """Stats line and up to 10 pending tasks for the sidebar, cached per plan signature."""
+    return plan.get_stats_text().replace("**", ""), tuple(plan.get_todays_tasks()[:10])
+
+
+def _apply_task_edits(editor_key: str, task_ids: tuple[str, ...]) -> None:
+    """on_change callback: complete or skip the ticked rows before the fragment reruns."""
+    for row, change in st.session_state[editor_key]["edited_rows"].items():
+        if change.get("done"):
+            plan.complete_task(task_ids[int(row)])
+        elif change.get("skip"):
+            plan.skip_task(task_ids[int(row)])
+
+
+@st.fragment
+def _render_sidebar() -> None:
+    """Stats + today's tasks. Ticking a task reruns only this fragment, not the chat."""
+    stats_text, todays = _sidebar_snapshot(plan_signature())
     st.markdown("### 📊 Your stats")
-    stats_text = plan.get_stats_text().replace("**", "")
     st.caption(stats_text)
     st.markdown("---")
     st.markdown("### 📋 Today's tasks")
-    todays = plan.get_todays_tasks()
     if not todays:
         st.caption("No pending tasks. Add subjects, then *task &lt;subject&gt; &lt;title&gt;*.")
     else:
-        for t in todays[:10]:
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.caption(f"**{t.title}** — {t.subject_name} `{t.id}`")
-            with col2:
-                if st.button("✓", key=f"done_{t.id}", help="Mark done"):
-                    plan.complete_task(t.id)
-                    st.rerun()
-                if st.button("⊘", key=f"skip_{t.id}", help="Skip"):
-                    plan.skip_task(t.id)
-                    st.rerun()
+        # Keyed on rev so ticks reset after each save.
+        editor_key = f"tasks_editor_{plan.rev}"
+        st.data_editor(
+            [
+                {"done": False, "skip": False, "title": t.title, "subject": t.subject_name, "id": t.id}
+                for t in todays
+            ],
+            key=editor_key,
+            on_change=_apply_task_edits,
+            args=(editor_key, tuple(t.id for t in todays)),
+            hide_index=True,
+            disabled=("title", "subject", "id"),
+            column_config={
+                "done": st.column_config.CheckboxColumn("✓", help="Mark done", width="small"),
+                "skip": st.column_config.CheckboxColumn("⊘", help="Skip", width="small"),
+                "title": st.column_config.TextColumn("Task"),
+                "subject": st.column_config.TextColumn("Subject"),
+                "id": st.column_config.TextColumn("ID", width="small"),
+            },
+        )
     st.markdown("---")
     st.caption("Ultimate AI Study Planner Bot · Control your study.")
 
+
+# ----- Sidebar: stats + today's tasks -----
+with st.sidebar:
+    _render_sidebar()
+
 # ----- Main: chat -----
 st.title("📚 Ultimate AI Study Planner Bot")
 st.markdown('<p class="subtitle">Your autonomous study mentor — add subjects, tasks, exams; track points and streaks.</p>', unsafe_allow_html=True)
 
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
+HISTORY_WINDOW = 50  # messages replayed per run; older ones load on demand
+
+
+@st.fragment
+def _render_history() -> None:
+    """Replay the chat log. The toggle reruns only this fragment, not the whole page."""
+    messages = st.session_state.messages
+    hidden = len(messages) - HISTORY_WINDOW
+    # Fixed label: some Streamlit versions derive the widget id from it, and the id must survive new messages.
+    if hidden > 0 and not st.toggle("Show earlier messages", key="show_full_history"):
+        st.caption(f"{hidden} earlier messages hidden.")
+        messages = messages[hidden:]
+    for msg in messages:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+
+_render_history()
 
 if prompt := st.chat_input("Add subject, task, ask for schedule, stats, exams..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -4,10 +4,17 @@ Subjects, tasks, exams, points, levels, streaks, behavior log, and adaptation.
 """
 from __future__ import annotations
 
+import bisect
+from collections import Counter, deque
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import date, datetime
-from typing import Optional
-import uuid
+from datetime import date
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+import math
+import os
+import re
+import sys
 
 import storage as store
 
@@ -17,9 +24,11 @@ POINTS_PER_SKIP_PENALTY = -3
 LEVEL_POINTS_STEP = 100  # level = 1 + total_points // 100
 DEFAULT_STUDY_HOURS_PER_DAY = 4.0
 MAX_STREAK_BONUS_POINTS = 5  # extra points when on streak
+RECENT_WINDOW = 14  # behavior-log entries that count as "recent" for adaptation
+_CHAPTER_SEP_TRANS = str.maketrans(",;/", "   ")  # chapter list separators -> spaces
 
 
-@dataclass
+@dataclass(slots=True)
 class Subject:
     name: str
     hours_per_week: float = 0.0
@@ -38,16 +47,17 @@ class Subject:
 
     @staticmethod
     def from_dict(d: dict) -> Subject:
+        hours = float(d.get("hours_per_week") or 0)
         return Subject(
-            name=d.get("name", ""),
-            hours_per_week=float(d.get("hours_per_week", 0)),
+            name=_intern_name(d.get("name", "")),
+            hours_per_week=hours if math.isfinite(hours) else 0.0,  # inf/NaN, e.g. from an old "add ... Infinity"
             priority=int(d.get("priority", 1)),
             deadline=d.get("deadline"),
             subject_type=d.get("subject_type", "general"),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     id: str
     subject_name: str
@@ -73,8 +83,8 @@ class Task:
     @staticmethod
     def from_dict(d: dict) -> Task:
         return Task(
-            id=d.get("id", str(uuid.uuid4())[:8]),
-            subject_name=d.get("subject_name", ""),
+            id=d.get("id") or _short_id(),
+            subject_name=_intern_name(d.get("subject_name", "")),
             title=d.get("title", ""),
             due_date=d.get("due_date"),
             done=bool(d.get("done", False)),
@@ -84,7 +94,7 @@ class Task:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Exam:
     id: str
     name: str
@@ -106,23 +116,24 @@ class Exam:
     @staticmethod
     def from_dict(d: dict) -> Exam:
         return Exam(
-            id=d.get("id", str(uuid.uuid4())[:8]),
+            id=d.get("id") or _short_id(),
             name=d.get("name", ""),
-            subject_name=d.get("subject_name", ""),
+            subject_name=_intern_name(d.get("subject_name", "")),
             exam_date=d.get("exam_date", ""),
             weight=d.get("weight", ""),
             chapters=d.get("chapters", ""),
         )
 
-    def days_left(self) -> Optional[int]:
+    def days_left(self, today: date | None = None) -> Optional[int]:
+        """Days until the exam; pass today when checking many exams to read the clock once."""
         try:
-            d = datetime.strptime(self.exam_date, "%Y-%m-%d").date()
-            return (d - date.today()).days
+            d = _parse_iso(self.exam_date)
+            return (d - (today or date.today())).days
         except (ValueError, TypeError):
             return None
 
 
-@dataclass
+@dataclass(slots=True)
 class UserStats:
     total_points: int = 0
     current_streak: int = 0
@@ -147,49 +158,90 @@ class UserStats:
         )
 
 
+def _parse_iso(s: str) -> date:
+    """YYYY-MM-DD -> date."""
+    return date.fromisoformat(s)
+
+
+def _schedule_key(s: Subject) -> tuple[int, float]:
+    """Scheduling order: priority first (1 = high), then more weekly hours first."""
+    return (s.priority, -s.hours_per_week)
+
+
+def _short_id() -> str:
+    """8 hex chars for task/exam ids, straight from 4 random bytes."""
+    return os.urandom(4).hex()
+
+
+def _intern_name(v: object) -> str:
+    """Interned subject name from stored data; null or non-string values (e.g. a hand-edited file) load as text."""
+    if v is None:
+        return ""
+    return sys.intern(v if isinstance(v, str) else str(v))
+
+
 def _today_str() -> str:
     return date.today().isoformat()
 
 
-def _update_streak(last_date: Optional[str], today: str) -> int:
-    """Return new streak: 1 if first time today, or last_streak+1 if yesterday was last_date."""
+def _update_streak(prev_streak: int, last_date: Optional[str], today: str) -> int:
+    """Return the streak after a completion today: +1 the day after last_date, unchanged same day, else reset to 1."""
     if not last_date:
-        return 1
+        return prev_streak + 1
     try:
-        last = datetime.strptime(last_date, "%Y-%m-%d").date()
-        td = date.today()
-        delta = (td - last).days
-        if delta == 0:
-            return 0  # already counted today
-        if delta == 1:
-            return 1  # will be set to previous_streak + 1 by caller
-        return 0  # streak broken
+        delta = (_parse_iso(today) - _parse_iso(last_date)).days
     except (ValueError, TypeError):
-        return 1
+        return prev_streak + 1
+    return {0: prev_streak, 1: prev_streak + 1}.get(delta, 1)
 
 
 class StudyPlan:
     """Single source of truth: subjects, tasks, exams, stats, behavior. Persisted to storage."""
 
     def __init__(self) -> None:
-        self.subjects: list[Subject] = []
+        self.subjects: list[Subject] = []  # insertion order (as listed to the user)
+        self._sorted_subjects: list[Subject] = []  # same subjects, kept in _schedule_key order
         self.tasks: list[Task] = []
         self.exams: list[Exam] = []
+        self._task_index: dict[str, Task] = {}  # id -> task, kept in step with self.tasks
+        self._tasks_by_subject: dict[str, list[Task]] = {}  # lowercased subject name -> its tasks, in order
+        self._exam_index: dict[str, Exam] = {}  # id -> exam, kept in step with self.exams
         self.user_stats = UserStats()
-        self.behavior_log: list[dict] = []
+        self.behavior_log: deque[dict] = deque(maxlen=store.MAX_LOG_ENTRIES)  # oldest entries fall off
+        # Actions of the last RECENT_WINDOW log entries, with running counts per action.
+        self._recent_actions: deque[str | None] = deque(maxlen=RECENT_WINDOW)
+        self._recent_counts: Counter[str | None] = Counter()
+        self.rev = 0  # bumped on every save; lets the UI cache views of unchanged state
+        self._batch_depth = 0  # > 0 inside batch(): saves are deferred to the outermost exit
+        self._dirty = False  # a save was deferred by batch()
+        self._subjects_text: tuple[int, str] | None = None  # (rev, list_subjects output)
+        self._schedule_cols: tuple[int, tuple[str, ...], tuple[float, ...]] | None = None  # (rev, names, hours)
         self._load()
 
     def _load(self) -> None:
-        plan = store.load_plan_data()
-        self.subjects = [Subject.from_dict(s) for s in plan["subjects"]]
-        self.tasks = [Task.from_dict(t) for t in plan["tasks"]]
-        self.exams = [Exam.from_dict(e) for e in plan["exams"]]
-        stats = store.load_user_stats()
+        subjects, tasks, exams, stats, log = store.load_all()
+        self.subjects = [Subject.from_dict(s) for s in subjects]
+        self._sorted_subjects = sorted(self.subjects, key=_schedule_key)
+        self.tasks = [Task.from_dict(t) for t in tasks]
+        self.exams = [Exam.from_dict(e) for e in exams]
+        self._task_index = {t.id: t for t in self.tasks}
+        self._tasks_by_subject = {}
+        for t in self.tasks:
+            self._tasks_by_subject.setdefault(t.subject_name.lower(), []).append(t)
+        self._exam_index = {e.id: e for e in self.exams}
         if stats:
             self.user_stats = UserStats.from_dict(stats)
-        self.behavior_log = store.load_behavior_log()
+        self.behavior_log = deque(log, maxlen=store.MAX_LOG_ENTRIES)
+        self._reset_recent()
 
     def _save(self) -> None:
+        self.rev += 1
+        if self._batch_depth:
+            self._dirty = True
+            return
+        self._write()
+
+    def _write(self) -> None:
         store.save_all(
             subjects=[s.to_dict() for s in self.subjects],
             tasks=[t.to_dict() for t in self.tasks],
@@ -198,6 +250,35 @@ class StudyPlan:
             behavior_log=self.behavior_log,
         )
 
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Group several changes into one save: writes are deferred until the outermost batch exits."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._dirty = False
+                self._write()
+
+    def _reset_recent(self) -> None:
+        self._recent_actions.clear()
+        # The window only needs the last RECENT_WINDOW entries.
+        tail = list(islice(reversed(self.behavior_log), RECENT_WINDOW))
+        self._recent_actions.extend(x.get("action") for x in reversed(tail))
+        self._recent_counts = Counter(self._recent_actions)
+
+    def _log_action(self, entry: dict) -> None:
+        """Append to behavior_log and slide the recent-actions window."""
+        self.behavior_log.append(entry)
+        window = self._recent_actions
+        if len(window) == window.maxlen:
+            self._recent_counts[window[0]] -= 1
+        action = entry.get("action")
+        window.append(action)
+        self._recent_counts[action] += 1
+
     # --- Subjects ---
     def add_subject(
         self,
@@ -207,50 +288,65 @@ class StudyPlan:
         deadline: str | None = None,
         subject_type: str = "general",
     ) -> str:
-        self.subjects.append(
-            Subject(
-                name=name,
-                hours_per_week=hours,
-                priority=priority,
-                deadline=deadline,
-                subject_type=subject_type,
-            )
+        if not math.isfinite(hours):  # JSON has no inf/NaN; orjson would write them as null
+            return "Hours must be a finite number, e.g. *Add Math 5*."
+        # Interned so tasks/exams naming this subject share one string object.
+        name = sys.intern(name.strip())
+        s = Subject(
+            name=name,
+            hours_per_week=hours,
+            priority=priority,
+            deadline=deadline,
+            subject_type=subject_type,
         )
+        self.subjects.append(s)
+        bisect.insort(self._sorted_subjects, s, key=_schedule_key)
         self._save()
         return f"Added **{name}** — {hours}h/week, priority {priority}, type: {subject_type}."
 
     def list_subjects(self) -> str:
         if not self.subjects:
             return "No subjects. Add one: *Add Math 5 hours* or *Add DSA 6*."
-        lines = ["**Your subjects:**"]
-        for i, s in enumerate(self.subjects, 1):
-            extra = f", deadline: {s.deadline}" if s.deadline else f", type: {s.subject_type}"
-            lines.append(f"{i}. **{s.name}** — {s.hours_per_week}h/week, P{s.priority}{extra}")
-        return "\n".join(lines)
+        cached = self._subjects_text
+        if cached and cached[0] == self.rev:
+            return cached[1]
+        text = "\n".join([
+            "**Your subjects:**",
+            *(
+                f"{i}. **{s.name}** — {s.hours_per_week}h/week, P{s.priority}"
+                + (f", deadline: {s.deadline}" if s.deadline else f", type: {s.subject_type}")
+                for i, s in enumerate(self.subjects, 1)
+            ),
+        ])
+        self._subjects_text = (self.rev, text)
+        return text
 
     def clear_subjects(self) -> str:
         self.subjects.clear()
+        self._sorted_subjects.clear()
         self._save()
         return "All subjects cleared."
 
     # --- Tasks ---
     def add_task(self, subject_name: str, title: str, due_date: str | None = None) -> str:
-        tid = str(uuid.uuid4())[:8]
+        tid = _short_id()
         t = Task(
             id=tid,
-            subject_name=subject_name,
+            subject_name=sys.intern(subject_name),
             title=title,
             due_date=due_date,
             created_at=_today_str(),
         )
         self.tasks.append(t)
+        self._task_index[tid] = t
+        self._tasks_by_subject.setdefault(subject_name.lower(), []).append(t)
         self._save()
         return f"Task added: **{title}** ({subject_name}). Due: {due_date or '—'}."
 
     def list_tasks(self, subject_name: str | None = None, pending_only: bool = False) -> str:
         tasks = self.tasks
         if subject_name:
-            tasks = [t for t in tasks if t.subject_name.lower() == subject_name.lower()]
+            tasks = self._tasks_by_subject.get(subject_name.lower(), [])
         if pending_only:
             tasks = [t for t in tasks if not t.done and not t.skipped]
         if not tasks:
@@ -262,85 +358,92 @@ class StudyPlan:
         return "\n".join(lines)
 
     def complete_task(self, task_id: str) -> str:
-        for t in self.tasks:
-            if t.id == task_id:
-                if t.done:
-                    return "Task already done."
-                t.done = True
-                t.completed_at = _today_str()
-                today = _today_str()
-                # Points and streak
-                points = POINTS_PER_TASK
-                if self.user_stats.last_completion_date == today:
-                    pass  # no double count same day
-                else:
-                    streak_inc = _update_streak(self.user_stats.last_completion_date, today)
-                    if streak_inc == 0 and self.user_stats.last_completion_date != today:
-                        self.user_stats.current_streak = 1
-                    else:
-                        self.user_stats.current_streak += 1
-                    self.user_stats.last_completion_date = today
-                    self.user_stats.total_points += points
-                    if self.user_stats.current_streak > 1:
-                        self.user_stats.total_points += min(MAX_STREAK_BONUS_POINTS, self.user_stats.current_streak - 1)
-                self.behavior_log.append({
-                    "date": today,
-                    "task_id": task_id,
-                    "action": "done",
-                    "title": t.title,
-                })
-                self._save()
-                return f"Done. **+{points} pts** | Streak: {self.user_stats.current_streak} | Level {self.user_stats.level()}."
-        return "Task not found."
+        t = self._task_index.get(task_id)
+        if not t:
+            return "Task not found."
+        if t.done:
+            return "Task already done."
+        today = _today_str()
+        t.done = True
+        t.completed_at = today
+        # Points and streak (no double count same day)
+        points = POINTS_PER_TASK
+        if self.user_stats.last_completion_date != today:
+            self.user_stats.current_streak = _update_streak(
+                self.user_stats.current_streak, self.user_stats.last_completion_date, today
+            )
+            self.user_stats.last_completion_date = today
+            self.user_stats.total_points += points
+            if self.user_stats.current_streak > 1:
+                self.user_stats.total_points += min(MAX_STREAK_BONUS_POINTS, self.user_stats.current_streak - 1)
+        self._log_action({
+            "date": today,
+            "task_id": task_id,
+            "action": "done",
+            "title": t.title,
+        })
+        self._save()
+        return f"Done. **+{points} pts** | Streak: {self.user_stats.current_streak} | Level {self.user_stats.level()}."
 
     def _recent_skips(self) -> int:
-        """Number of skips in last 14 days (for stricter messaging)."""
-        return sum(1 for x in self.behavior_log[-14:] if x.get("action") == "skip")
+        """Number of skips in the last RECENT_WINDOW log entries (for stricter messaging)."""
+        return self._recent_counts["skip"]
 
     def skip_task(self, task_id: str) -> str:
-        for t in self.tasks:
-            if t.id == task_id:
-                if t.done:
-                    return "Task already done."
-                t.skipped = True
-                self.user_stats.total_points += POINTS_PER_SKIP_PENALTY
-                self.behavior_log.append({
-                    "date": _today_str(),
-                    "task_id": task_id,
-                    "action": "skip",
-                    "title": t.title,
-                })
-                self._save()
-                n = self._recent_skips()
-                if n >= 3:
-                    return f"Skipped. **{POINTS_PER_SKIP_PENALTY} pts.** You have skipped {n} times recently. Next skip will reduce your daily plan. Do the next task."
-                return f"Skipped. **{POINTS_PER_SKIP_PENALTY} pts.** Stay consistent."
-        return "Task not found."
+        t = self._task_index.get(task_id)
+        if not t:
+            return "Task not found."
+        if t.done:
+            return "Task already done."
+        t.skipped = True
+        self.user_stats.total_points += POINTS_PER_SKIP_PENALTY
+        self._log_action({
+            "date": _today_str(),
+            "task_id": task_id,
+            "action": "skip",
+            "title": t.title,
+        })
+        self._save()
+        n = self._recent_skips()
+        if n >= 3:
+            return f"Skipped. **{POINTS_PER_SKIP_PENALTY} pts.** You have skipped {n} times recently. Next skip will reduce your daily plan. Do the next task."
+        return f"Skipped. **{POINTS_PER_SKIP_PENALTY} pts.** Stay consistent."
+
+    def _schedule_columns(self) -> tuple[tuple[str, ...], tuple[float, ...]]:
+        """Subject names and weekly hours as parallel columns in schedule order, rebuilt once per revision."""
+        cols = self._schedule_cols
+        if cols is None or cols[0] != self.rev:
+            subs = self._sorted_subjects
+            cols = (self.rev, tuple(s.name for s in subs), tuple(s.hours_per_week for s in subs))
+            self._schedule_cols = cols
+        return cols[1], cols[2]
 
     def suggest_daily_schedule(self, study_hours_per_day: float = DEFAULT_STUDY_HOURS_PER_DAY) -> str:
         if not self.subjects:
             return "Add subjects first. Then ask for *schedule*."
-        total = sum(s.hours_per_week for s in self.subjects) or len(self.subjects) * 2
-        sorted_subs = sorted(self.subjects, key=lambda x: (x.priority, -x.hours_per_week))
+        names, hours = self._schedule_columns()
+        total = sum(hours) or len(hours) * 2
+        # Each subject gets its share of the day's minutes, at least 15.
+        minutes_budget = study_hours_per_day * 60
+        denom = max(total, 1)
         lines = [f"**Today’s plan** ({study_hours_per_day}h total):"]
-        for s in sorted_subs:
-            ratio = (s.hours_per_week or 1) / max(total, 1)
-            mins = max(15, int(study_hours_per_day * 60 * ratio))
-            lines.append(f"• **{s.name}**: {mins} min")
+        lines.extend(
+            f"• **{name}**: {max(15, int(minutes_budget * ((h or 1) / denom)))} min"
+            for name, h in zip(names, hours)
+        )
         return "\n".join(lines)
 
     def suggest_weekly_schedule(self, study_hours_per_day: float = DEFAULT_STUDY_HOURS_PER_DAY) -> str:
         """Weekly view: distribute subjects across the week by hours_per_week."""
         if not self.subjects:
             return "Add subjects first. Then ask for *weekly plan*."
-        sorted_subs = sorted(self.subjects, key=lambda x: (x.priority, -x.hours_per_week))
-        lines = [f"**This week** (~{study_hours_per_day * 7:.0f}h total):"]
-        for s in sorted_subs:
-            mins_per_day = max(10, int((s.hours_per_week or 1) / 7 * 60))
-            lines.append(f"• **{s.name}**: {s.hours_per_week}h/week → ~{mins_per_day} min/day")
-        lines.append("")
-        lines.append("**Focus:** Mon–Wed high-priority; Thu–Fri catch-up; Sat–Sun revision.")
-        return "\n".join(lines)
+        names, hours = self._schedule_columns()
+        return "\n".join([
+            f"**This week** (~{study_hours_per_day * 7:.0f}h total):",
+            *(f"• **{name}**: {h}h/week → ~{max(10, int((h or 1) / 7 * 60))} min/day" for name, h in zip(names, hours)),
+            "",
+            "**Focus:** Mon–Wed high-priority; Thu–Fri catch-up; Sat–Sun revision.",
+        ])
 
     def get_todays_tasks(self) -> list[Task]:
         """Pending tasks (not done, not skipped) for today’s focus — by subject from daily plan."""
@@ -354,14 +457,15 @@ class StudyPlan:
     # --- Exams ---
     def add_exam(self, name: str, subject_name: str, exam_date: str, weight: str = "", chapters: str = "") -> str:
         e = Exam(
-            id=str(uuid.uuid4())[:8],
+            id=_short_id(),
             name=name,
-            subject_name=subject_name,
+            subject_name=sys.intern(subject_name),
             exam_date=exam_date,
             weight=weight,
             chapters=chapters,
         )
         self.exams.append(e)
+        self._exam_index[e.id] = e
         self._save()
         return f"Exam added: **{name}** ({subject_name}) on {exam_date}. Days left: {e.days_left() or '?'}."
 
@@ -369,15 +473,16 @@ class StudyPlan:
         if not self.exams:
             return "No exams. Add: *exam &lt;name&gt; &lt;subject&gt; &lt;YYYY-MM-DD&gt;*."
         lines = ["**Exams:** (use *revision plan &lt;id&gt;* for chapter spread)"]
+        today = date.today()
         for e in self.exams:
-            dl = e.days_left()
+            dl = e.days_left(today)
             dl_str = f" — {dl} days left" if dl is not None else ""
             lines.append(f"• **{e.name}** ({e.subject_name}) — {e.exam_date}{dl_str} `{e.id}`")
         return "\n".join(lines)
 
     def get_revision_plan(self, exam_id: str) -> str:
         """Spread exam chapters over days left. Exam must have chapters set (e.g. '1-5' or '1,2,3')."""
-        exam = next((e for e in self.exams if e.id == exam_id), None)
+        exam = self._exam_index.get(exam_id)
         if not exam:
             return "Exam not found."
         days = exam.days_left()
@@ -386,9 +491,9 @@ class StudyPlan:
         ch = (exam.chapters or "").strip()
         if not ch:
             return f"**{exam.name}** — Add chapters first: edit exam or add with *exam ... chapters 1-5*."
-        # Parse chapters: "1-5" -> [1,2,3,4,5], "1,2,3" -> [1,2,3]
+        # Parse chapters: "1-5" -> [1,2,3,4,5], "1,2,3" / "1;2;3" / "1/2/3" -> [1,2,3]
         parts = []
-        for p in ch.replace(",", " ").split():
+        for p in ch.translate(_CHAPTER_SEP_TRANS).split():
             if "-" in p:
                 a, b = p.split("-", 1)
                 try:
@@ -405,23 +510,20 @@ class StudyPlan:
         # Spread over days_left (each day 1+ chapters if needed)
         n = len(parts)
         per_day = max(1, (n + days - 1) // days)
+        # Day d covers labels[(d-1)*per_day : d*per_day]; per_day * days >= n, so every item gets a day.
+        labels = [f"Ch{x}" for x in parts]
         lines = [f"**Revision plan: {exam.name}** — {n} items over {days} days:"]
-        day = 1
-        i = 0
-        while i < n and day <= days:
-            chunk = parts[i : i + per_day]
-            i += len(chunk)
-            ch_str = ", ".join(f"Ch{x}" for x in chunk)
-            lines.append(f"• Day {day}: {ch_str}")
-            day += 1
+        lines.extend(
+            f"• Day {day}: {', '.join(labels[start:start + per_day])}"
+            for day, start in enumerate(range(0, n, per_day), 1)
+        )
         return "\n".join(lines)
 
     # --- Adaptation (simple) ---
     def get_adaptive_study_hours(self) -> float:
         """Reduce load after skips; maintain or slightly increase when streak good."""
-        recent = [x for x in self.behavior_log[-14:]]  # last 2 weeks
-        skips = sum(1 for x in recent if x.get("action") == "skip")
-        dones = sum(1 for x in recent if x.get("action") == "done")
+        skips = self._recent_counts["skip"]
+        dones = self._recent_counts["done"]
         if skips > dones and skips >= 3:
             return max(2.0, DEFAULT_STUDY_HOURS_PER_DAY - 1.0)
         if self.user_stats.current_streak >= 3:
@@ -436,80 +538,183 @@ class StudyPlan:
 
     def clear(self) -> str:
         self.subjects.clear()
+        self._sorted_subjects.clear()
         self.tasks.clear()
         self.exams.clear()
+        self._task_index.clear()
+        self._tasks_by_subject.clear()
+        self._exam_index.clear()
         self.user_stats = UserStats()
         self.behavior_log.clear()
+        self._reset_recent()
         self._save()
         return "All data cleared. Fresh start."
 
 
 # --- Subject type from chat (coding / college) ---
 SUBJECT_TYPE_KEYWORDS = {
-    "coding": ["coding", "code", "dsa", "programming", "algorithms", "interview", "debugging"],
-    "college": ["college", "theory", "numericals", "derivations"],
+    "coding": ("coding", "code", "dsa", "programming", "algorithms", "interview", "debugging"),
+    "college": ("college", "theory", "numericals", "derivations"),
+}
+# One alternation per type; substring match like the keyword lists (e.g. "code" also hits "codeforces").
+_SUBJECT_TYPE_PATTERNS = {
+    stype: re.compile("|".join(map(re.escape, kws))) for stype, kws in SUBJECT_TYPE_KEYWORDS.items()
 }
 
 
 def _infer_subject_type(rest_lower: str) -> str:
-    for stype, keywords in SUBJECT_TYPE_KEYWORDS.items():
-        if any(kw in rest_lower for kw in keywords):
+    for stype, pat in _SUBJECT_TYPE_PATTERNS.items():
+        if pat.search(rest_lower):
             return stype
     return "general"
 
 
 # --- Command parsing (for chat) ---
+# "[...] add <name> [<hours> ...]"; the first number after the name is the weekly hours.
+ADD_RE = re.compile(
+    r"(?:^|\s)add\s+(?P<rest>(?P<name>.+?)(?:\s+(?P<hours>\d+(?:\.\d*)?)(?:\s.*)?)?)\s*$",
+    re.I | re.DOTALL,
+)
+# Filler words dropped from subject names ("add subject Math", "add Physics topic 3").
+_STOPWORD_RE = re.compile(r"\s*\b(?:subject|topic)\b", re.I)
+
+
 def parse_add_command(text: str) -> dict | None:
-    t = text.strip().lower()
-    if not t.startswith("add ") and " add " not in t:
+    m = ADD_RE.search(text.strip())
+    if not m:
         return None
-    rest = text.strip().split(" add ", 1)[-1].strip().replace("subject", "").replace("topic", "").strip()
-    if not rest:
-        return None
-    subject_type = _infer_subject_type(rest)
-    parts = rest.split()
-    name_parts = []
-    hours = 0.0
-    for p in parts:
-        try:
-            hours = float(p)
-            break
-        except ValueError:
-            name_parts.append(p)
-    name = " ".join(name_parts).strip() if name_parts else (parts[0] if parts else "")
+    name = " ".join(_STOPWORD_RE.sub("", m["name"]).split())  # one line, single-spaced, for the **name** markdown
     if not name:
         return None
+    hours = float(m["hours"]) if m["hours"] else 0.0
     if hours == 0:
         hours = 2.0
-    return {"name": name, "hours": hours, "subject_type": subject_type}
+    return {"name": name, "hours": hours, "subject_type": _infer_subject_type(m["rest"].lower())}
+
+
+def parse_add_batch(lines: Iterable[str]) -> list[dict] | None:
+    """Parse pasted add commands, one per line. None unless every non-blank line is an add."""
+    parsed = []
+    for line in lines:
+        if not line.strip():
+            continue
+        cmd = parse_add_command(line)
+        if cmd is None:
+            return None
+        parsed.append(cmd)
+    return parsed or None
+
+
+# Chat routes: task, exam, and the one-argument commands.
+TASK_RE = re.compile(r"task\s+(.+?)(?:\s+due\s+(\d{4}-\d{2}-\d{2}))?$", re.I | re.DOTALL)
+EXAM_RE = re.compile(r"exam\s+(.+?)\s+(\S+)\s+(\d{4}-\d{2}-\d{2})(?:\s+chapters\s+(.+))?$", re.I)
+SIMPLE_CMD_RES = {
+    "done": re.compile(r"done\s+(\w+)"),
+    "skip": re.compile(r"skip\s+(\w+)"),
+    "revision": re.compile(r"revision\s+(?:plan\s+)?(\w+)"),
+    "explain": re.compile(r"explain\s+(.+)"),
+}
+
+
+def parse_task_command(text: str) -> dict | None:
+    """Parse task <subject> <title> [due YYYY-MM-DD]. An empty title means the command is incomplete."""
+    m = TASK_RE.match(text)
+    if not m:
+        return None
+    parts = m.group(1).strip().split(maxsplit=1)
+    return {
+        "subject_name": parts[0] if parts else "",
+        "title": parts[1] if len(parts) >= 2 else "",
+        "due_date": m.group(2),
+    }
+
+
+def parse_exam_command(text: str) -> dict | None:
+    """Parse exam <name> <subject> <YYYY-MM-DD> [chapters 1-5]."""
+    m = EXAM_RE.match(text)
+    if not m:
+        return None
+    return {
+        "name": m.group(1).strip(),
+        "subject_name": m.group(2).strip(),
+        "exam_date": m.group(3).strip(),
+        "chapters": (m.group(4) or "").strip(),
+    }
+
+
+def parse_simple_cmd(verb: str, text: str) -> str | None:
+    """Argument of a one-argument command: done/skip <task_id>, revision [plan] <exam_id>, explain <topic>."""
+    m = SIMPLE_CMD_RES[verb].match(text)
+    return m.group(1).strip() if m else None
+
+
+# Keyword intents: one scan over the message; INTENT_ORDER sets precedence when several match.
+INTENT_RE = re.compile(
+    r"(?P<list_subj>list subjects|show subjects|subjects|what are my subjects)"
+    r"|(?P<list_tasks>list tasks|show tasks|my tasks|tasks)"
+    r"|(?P<exams>list exams|exams|show exams)"
+    r"|(?P<stats>stats|level|points|streak)"
+    r"|(?P<weekly>weekly|week plan|this week)"
+    r"|(?P<daily>schedule|daily|plan for today|today|plan)"
+    r"|(?P<clear>clear|reset)"
+    r"|(?P<hello>\bhi\b|\bhello\b|\bhey\b|\bhelp\b)"
+)
+INTENT_ORDER = ("list_subj", "list_tasks", "exams", "stats", "weekly", "daily", "clear", "hello")
+
+# One-word messages ("stats", "tasks", "hi", ...) map straight to their intent.
+STATS_KW = frozenset({"stats", "level", "points", "streak"})
+CLEAR_KW = frozenset({"clear", "reset"})
+HELLO_KW = frozenset({"hi", "hello", "hey", "help"})
+KEYWORD_INTENTS = {
+    "subjects": "list_subj",
+    "tasks": "list_tasks",
+    "exams": "exams",
+    "weekly": "weekly",
+    "schedule": "daily",
+    "daily": "daily",
+    "today": "daily",
+    "plan": "daily",
+    **dict.fromkeys(STATS_KW, "stats"),
+    **dict.fromkeys(CLEAR_KW, "clear"),
+    **dict.fromkeys(HELLO_KW, "hello"),
+}
+
+
+def match_intent(text: str) -> str | None:
+    """Return the highest-precedence keyword intent found in text, or None."""
+    intent = KEYWORD_INTENTS.get(text)
+    if intent:
+        return intent
+    found = {m.lastgroup for m in INTENT_RE.finditer(text)}
+    return next((name for name in INTENT_ORDER if name in found), None)
 
 
 # --- Explain topic (exam-oriented key points) ---
-CONCEPT_BANK: dict[str, list[str]] = {
-    "array": [
+CONCEPT_BANK: dict[str, tuple[str, ...]] = {
+    "array": (
         "**Array** — contiguous memory; O(1) access by index; fixed size (or dynamic in some languages).",
         "Exam: traversal, two-pointer, prefix sum, sliding window.",
-    ],
-    "dsa": [
+    ),
+    "dsa": (
         "**DSA** — Data Structures (array, linked list, stack, queue, tree, graph, hash) + Algorithms (sort, search, recursion, DP).",
         "Exam: identify structure → choose algorithm → code with edge cases.",
-    ],
-    "recursion": [
+    ),
+    "recursion": (
         "**Recursion** — base case + recurrence; stack holds state; convert to iteration via stack/queue.",
         "Exam: tree/graph DFS, divide-and-conquer, backtracking.",
-    ],
-    "dynamic programming": [
+    ),
+    "dynamic programming": (
         "**DP** — optimal substructure + overlapping subproblems; memoize or tabulate; state = (index, constraint).",
         "Exam: state definition, transition, base case, order of fill.",
-    ],
-    "linked list": [
+    ),
+    "linked list": (
         "**Linked list** — node (data, next); O(1) insert/delete at head; need pointer for middle; cycle detection = fast/slow.",
         "Exam: reverse, merge, find middle, detect cycle.",
-    ],
-    "sorting": [
+    ),
+    "sorting": (
         "**Sorting** — comparison: Merge O(n log n), Quick average O(n log n); non-comparison: Count, Radix.",
         "Exam: when stable matters; in-place; time/space trade-off.",
-    ],
+    ),
 }
 
 
@@ -524,17 +729,25 @@ def explain_topic(topic: str) -> str:
     return f"No notes for \"{topic}\". Try: array, DSA, recursion, dynamic programming, linked list, sorting."
 
 
+_GREETING = (
+    "**Ultimate AI Study Planner Bot** — I plan, you execute.\n\n"
+    "• *Add subject* — e.g. *Add Math 5* or *Add DSA 6*\n"
+    "• *Schedule* — get today’s time split\n"
+    "• *Task &lt;subject&gt; &lt;title&gt;* — add a task\n"
+    "• *Tasks* — list tasks; *done &lt;id&gt;* / *skip &lt;id&gt;*\n"
+    "• *Exam &lt;name&gt; &lt;subject&gt; &lt;date&gt;* — add exam\n"
+    "• *Exams* — list · *Revision plan &lt;exam_id&gt;* — spread chapters over days left\n"
+    "• *Weekly* — this week's plan\n"
+    "• *Explain &lt;topic&gt;* — e.g. explain array, explain DP\n"
+    "• *Stats* — points, level, streak · *Clear* — reset all\n\n"
+    "What do you want to do?"
+)
+
+UNCLEAR_REPLY = (
+    "Unclear. Use: *add*, *schedule*, *weekly*, *task*, *tasks*, *done/skip &lt;id&gt;*, "
+    "*exam*, *exams*, *revision plan &lt;id&gt;*, *explain &lt;topic&gt;*, *stats*, *clear*."
+)
+
+
 def get_greeting() -> str:
-    return (
-        "**Ultimate AI Study Planner Bot** — I plan, you execute.\n\n"
-        "• *Add subject* — e.g. *Add Math 5* or *Add DSA 6*\n"
-        "• *Schedule* — get today’s time split\n"
-        "• *Task &lt;subject&gt; &lt;title&gt;* — add a task\n"
-        "• *Tasks* — list tasks; *done &lt;id&gt;* / *skip &lt;id&gt;*\n"
-        "• *Exam &lt;name&gt; &lt;subject&gt; &lt;date&gt;* — add exam\n"
-        "• *Exams* — list · *Revision plan &lt;exam_id&gt;* — spread chapters over days left\n"
-        "• *Weekly* — this week's plan\n"
-        "• *Explain &lt;topic&gt;* — e.g. explain array, explain DP\n"
-        "• *Stats* — points, level, streak · *Clear* — reset all\n\n"
-        "What do you want to do?"
-    )
+    return _GREETING
@@ -1,42 +1,155 @@
 """
 Persistence layer for Ultimate AI Study Planner Bot.
 Saves/loads plan, user stats, and behavior log to a single JSON file.
+
+The file is parsed once per process and kept in memory; saves update that copy and
+schedule a debounced write (see flush), so a burst of changes costs one disk write.
 """
 from __future__ import annotations
 
+import atexit
 import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
+
+try:
+    import orjson  # optional
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
 
 # Data file in project root (create .gitignore entry study_plan_data.json to avoid committing)
 DATA_DIR = Path(__file__).resolve().parent
 DATA_FILE = DATA_DIR / "study_plan_data.json"
+MAX_LOG_ENTRIES = 500  # behavior-log cap; StudyPlan holds the log in a deque of this size
+FLUSH_DELAY_SECONDS = 2.0  # pending changes reach disk at most this long after a save
+PRETTY_JSON = False  # indent the data file (handy when inspecting it; larger and slower to write)
 
+_cache: dict[str, Any] | None = None
+_dirty = False
+_flush_timer: threading.Timer | None = None
+_lock = threading.RLock()
 
-def load_raw() -> dict[str, Any]:
-    """Load raw JSON data. Returns empty dict if file missing or invalid."""
+
+def _dumps(data: dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if PRETTY_JSON else 0)
+    if PRETTY_JSON:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # files written by json may hold Infinity/NaN, which only json reads
+    return json.loads(raw)
+
+
+def _read_file() -> dict[str, Any]:
     if not DATA_FILE.exists():
         return {}
+    with open(DATA_FILE, "rb") as f:
+        raw = f.read()
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return {}
+        data = _loads(raw)
+    except ValueError:  # JSONDecodeError and UnicodeDecodeError
+        data = None
+    if isinstance(data, dict):
+        return data
+    # Unreadable data: move it aside so the next save cannot overwrite it.
+    backup = DATA_FILE.with_suffix(".json.corrupt")
+    os.replace(DATA_FILE, backup)
+    logger.warning("Could not parse %s; moved it to %s and starting empty.", DATA_FILE.name, backup.name)
+    return {}
+
+
+def load_raw() -> dict[str, Any]:
+    """Load raw data (parsed from disk on first call, then served from memory). Empty dict if file missing or invalid
+    (an invalid file is first moved to study_plan_data.json.corrupt).
+
+    Returns a shallow copy: callers may rebind keys freely, but must not mutate the nested lists/dicts in place.
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = _read_file()
+        return dict(_cache)
 
 
 def save_raw(data: dict[str, Any]) -> None:
-    """Write raw JSON data to disk."""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Replace the in-memory data and schedule a write to disk."""
+    global _cache, _dirty
+    with _lock:
+        _cache = data
+        _dirty = True
+        _schedule_flush()
+
+
+def _schedule_flush() -> None:
+    """Arm the debounce timer unless one is already pending. Caller holds _lock."""
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(FLUSH_DELAY_SECONDS, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush() -> None:
+    """Write pending changes to disk now.
+
+    Writes a temp file, fsyncs it and os.replace()s it over DATA_FILE, so a crash mid-write leaves
+    the previous file intact instead of a truncated one that would load as empty.
+    """
+    global _dirty, _flush_timer
+    with _lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        if not _dirty or _cache is None:
+            return
+        tmp = DATA_FILE.with_suffix(".json.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_dumps(_cache))
+                f.flush()
+                os.fsync(f.fileno())  # bytes on disk before the rename makes them visible
+            os.replace(tmp, DATA_FILE)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            _schedule_flush()  # still dirty: retry after another FLUSH_DELAY_SECONDS
+            raise
+        _dirty = False
+
+
+atexit.register(flush)
+
+
+def load_all() -> tuple[list[dict], list[dict], list[dict], dict[str, Any], list[dict[str, Any]]]:
+    """Load subjects, tasks, exams, user stats and behavior log from a single load_raw() call."""
+    raw = load_raw()
+    return (
+        list(raw.get("subjects", [])),
+        list(raw.get("tasks", [])),
+        list(raw.get("exams", [])),
+        dict(raw.get("user_stats", {})),
+        list(raw.get("behavior_log", [])),
+    )
 
 
 def load_plan_data() -> dict[str, Any]:
     """Load plan-related data: subjects, tasks, exams."""
     raw = load_raw()
     return {
-        "subjects": raw.get("subjects", []),
-        "tasks": raw.get("tasks", []),
-        "exams": raw.get("exams", []),
+        "subjects": list(raw.get("subjects", [])),
+        "tasks": list(raw.get("tasks", [])),
+        "exams": list(raw.get("exams", [])),
     }
 
 
@@ -52,7 +165,7 @@ def save_plan_data(subjects: list[dict], tasks: list[dict], exams: list[dict]) -
 def load_user_stats() -> dict[str, Any]:
     """Load user stats: points, level, streak, last_completion_date."""
     raw = load_raw()
-    return raw.get("user_stats", {})
+    return dict(raw.get("user_stats", {}))
 
 
 def save_user_stats(stats: dict[str, Any]) -> None:
@@ -65,14 +178,13 @@ def save_user_stats(stats: dict[str, Any]) -> None:
 def load_behavior_log() -> list[dict[str, Any]]:
     """Load completion/skip history for adaptation."""
     raw = load_raw()
-    return raw.get("behavior_log", [])
+    return list(raw.get("behavior_log", []))
 
 
-def save_behavior_log(log: list[dict[str, Any]]) -> None:
-    """Persist behavior log. Keeps last N entries to avoid huge files."""
-    MAX_ENTRIES = 500
+def save_behavior_log(log: Iterable[dict[str, Any]]) -> None:
+    """Persist behavior log. Callers keep it within MAX_LOG_ENTRIES (StudyPlan uses a bounded deque)."""
     raw = load_raw()
-    raw["behavior_log"] = log[-MAX_ENTRIES:]
+    raw["behavior_log"] = list(log)
     save_raw(raw)
 
 
@@ -81,7 +193,7 @@ def save_all(
     tasks: list[dict],
     exams: list[dict],
     user_stats: dict[str, Any],
-    behavior_log: list[dict],
+    behavior_log: Iterable[dict],
 ) -> None:
     """Persist full state in one write."""
     save_raw({
@@ -89,5 +201,5 @@ def save_all(
         "tasks": tasks,
         "exams": exams,
         "user_stats": user_stats,
-        "behavior_log": behavior_log,
+        "behavior_log": list(behavior_log),  # copy: the caller keeps appending to its log
     })